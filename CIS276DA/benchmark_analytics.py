@@ -0,0 +1,271 @@
+# ============================================================
+# Analytics Benchmark Suite
+# CIS 276DA -- Advanced SQL & Data Analytics | FLLC Enterprise
+# Author: Preston Furulie
+# ============================================================
+# Generates seeded synthetic product/order CSV files from 10^3 up
+# to 10^7 rows, streams them into columnar tables, times the core
+# data_analytics functions at each size (wall time, CPU time, peak
+# memory), writes the results to JSON and compares time and memory
+# against a stored baseline. parse_csv and group_by need the whole
+# dataset as text / row dicts, so they are only timed up to
+# IN_MEMORY_MAX_ROWS orders.
+#
+#   python benchmark_analytics.py --max-size 100000
+#   python benchmark_analytics.py --update-baseline
+#   python benchmark_analytics.py --baseline benchmark_baseline.json
+# ============================================================
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+from datetime import date, timedelta
+from itertools import accumulate
+from operator import itemgetter
+
+import data_analytics as da
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "benchmark_baseline.json")
+
+# A run slower (or using more peak memory) than baseline by more than this
+# factor is a regression.
+REGRESSION_THRESHOLD = 1.25
+
+# Rows generated, and parsed into a column batch, at a time.
+CHUNK_ROWS = 100000
+
+# Largest size at which the in-memory, row-dict functions are timed.
+IN_MEMORY_MAX_ROWS = 1000000
+
+
+# ── Synthetic Data ──────────────────────────────────────────
+
+def generate_products_csv(path, count, seed=42):
+    """Write count products in the PRODUCTS_CSV layout to path, line by line."""
+    rng = random.Random(seed)
+    start = date(2023, 1, 1)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("product_id,category_id,product_name,list_price,discount_percent,date_added\n")
+        for pid in range(1, count + 1):
+            category = rng.choices([1, 2, 3], weights=[6, 2, 2])[0]
+            price = round(rng.lognormvariate(7, 0.6), 2)
+            added = start + timedelta(days=rng.randrange(700))
+            f.write(f"{pid},{category},Product {pid},{price:.2f},"
+                    f"{rng.choice([0, 5, 10, 15, 20, 25])},{added.isoformat()}\n")
+
+
+def generate_orders_csv(path, count, product_count, seed=42):
+    """Write count orders in the ORDERS_CSV layout to path, CHUNK_ROWS at a time.
+
+    Product popularity is Zipf-like, customers number count/10, and about
+    one order in five is unshipped. Memory stays at one chunk of rows.
+    """
+    rng = random.Random(seed + 1)
+    start = date(2024, 1, 1)
+    customers = max(count // 10, 1)
+    cum_weights = list(accumulate(1 / rank for rank in range(1, product_count + 1)))
+    products = range(1, product_count + 1)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("order_id,customer_id,product_id,quantity,item_price,"
+                "discount_amount,order_date,ship_date\n")
+        for first in range(1, count + 1, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, count + 1 - first)
+            lines = []
+            for oid, pid in enumerate(rng.choices(products, cum_weights=cum_weights, k=n),
+                                      start=first):
+                price = round(rng.lognormvariate(7, 0.6), 2)
+                ordered = start + timedelta(days=rng.randrange(730))
+                shipped = ("" if rng.random() < 0.2
+                           else (ordered + timedelta(days=rng.randint(1, 5))).isoformat())
+                lines.append(f"{oid},{rng.randint(1, customers)},{pid},{rng.randint(1, 3)},"
+                             f"{price:.2f},{price * rng.choice([0, 0.05, 0.1, 0.15]):.2f},"
+                             f"{ordered.isoformat()},{shipped}\n")
+            f.writelines(lines)
+
+
+def load_table(path):
+    """Stream a CSV file into a ColumnTable, packing CHUNK_ROWS rows at a time."""
+    return da.ColumnTable.concat([da.ColumnTable.from_rows(batch) for batch
+                                  in da.iter_csv_file(path, batch_size=CHUNK_ROWS)])
+
+
+def count_rows(path):
+    """Stream every typed row of a CSV file without keeping any."""
+    return sum(1 for _ in da.iter_csv_file(path))
+
+
+# ── Benchmark Runner ────────────────────────────────────────
+
+def benchmark_size(size, profiler, seed=42, data_dir=None):
+    """Time every benchmarked function on one dataset size.
+
+    The dataset is written to CSV files in a temporary directory (under
+    data_dir if given) and streamed from there, so no stage holds the raw
+    text or a list of row dicts for the whole file.
+    """
+    product_count = max(size // 100, 10)
+    first_record = len(profiler.records)
+
+    with tempfile.TemporaryDirectory(dir=data_dir) as tmp, \
+            open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        products_path = os.path.join(tmp, "products.csv")
+        orders_path = os.path.join(tmp, "orders.csv")
+        generate_products_csv(products_path, product_count, seed)
+        generate_orders_csv(orders_path, size, product_count, seed)
+
+        profiler.wrap(count_rows, "iter_csv_file", rows_in=lambda: size)(orders_path)
+        if size <= IN_MEMORY_MAX_ROWS:
+            with open(orders_path, "r", encoding="utf-8") as f:
+                text = f.read()
+            rows = profiler.wrap(da.parse_csv, rows_in=lambda: size)(text)
+            del text
+            profiler.wrap(da.group_by)(rows, itemgetter("customer_id"))
+            del rows
+
+        pipeline = da.ETLPipeline(columnar=True)
+        pipeline.raw_products = load_table(products_path)
+        pipeline.raw_orders = profiler.wrap(load_table, "load_table",
+                                            rows_in=lambda: size)(orders_path)
+        profiler.wrap(pipeline.transform, "transform",
+                      rows_in=lambda: len(pipeline.raw_orders))()
+        products, orders = pipeline.clean_products, pipeline.clean_orders
+        totals = orders["line_total"]
+
+        profiler.wrap(da.statistical_summary)("Order Line Totals", totals)
+        profiler.wrap(da.group_aggregate)(orders, lambda o: da.ordinal_month(o["order_day"]),
+                                          {"revenue": (da.SumAgg, itemgetter("line_total"))})
+        profiler.wrap(da.moving_average)(totals, 30)
+        profiler.wrap(da.customer_rfm_analysis)(orders, top=20)
+        profiler.wrap(da.product_performance_matrix)(products, orders, top=20)
+
+    results = []
+    for record in profiler.records[first_record:]:
+        results.append({"size": size, "function": record["stage"],
+                        "wall_s": record["wall_s"], "cpu_s": record["cpu_s"],
+                        "peak_kb": record["peak_kb"]})
+    return results
+
+
+def _ratio(now, base):
+    """now/base, or None when either side is missing or the base is zero."""
+    if now is None or base is None or base <= 0:
+        return None
+    return now / base
+
+
+def compare_to_baseline(results, baseline, threshold=REGRESSION_THRESHOLD,
+                        memory_traced=True):
+    """Print new/baseline time and peak-memory ratios; return the regressions.
+
+    tracemalloc slows every allocation, so runs with and without memory
+    tracing are not comparable; a mismatch with the baseline's
+    meta.memory_traced raises ValueError.
+    """
+    base_traced = baseline.get("meta", {}).get("memory_traced")
+    if base_traced is not None and base_traced != memory_traced:
+        raise ValueError(f"Baseline was recorded with memory tracing "
+                         f"{'on' if base_traced else 'off'} but this run has it "
+                         f"{'on' if memory_traced else 'off'}; rerun "
+                         f"{'without' if base_traced else 'with'} --no-memory to compare")
+    previous = {(r["size"], r["function"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n  {'Size':>10} {'Function':<28} {'Base (s)':>10} {'Now (s)':>10} {'Time':>7} "
+          f"{'Base KB':>12} {'Now KB':>12} {'Memory':>7}")
+    print(f"  {'-' * 10} {'-' * 28} {'-' * 10} {'-' * 10} {'-' * 7} "
+          f"{'-' * 12} {'-' * 12} {'-' * 7}")
+    for r in results:
+        base = previous.get((r["size"], r["function"]))
+        if base is None:
+            continue
+        time_ratio = _ratio(r["wall_s"], base["wall_s"])
+        mem_ratio = _ratio(r["peak_kb"], base["peak_kb"])
+        slower = [kind for kind, ratio in (("TIME", time_ratio), ("MEMORY", mem_ratio))
+                  if ratio is not None and ratio > threshold]
+        flag = f"  << {'+'.join(slower)} REGRESSION" if slower else ""
+        if slower:
+            regressions.append(r)
+        cells = [f"{ratio:>6.2f}x" if ratio is not None else f"{'-':>7}"
+                 for ratio in (time_ratio, mem_ratio)]
+        base_kb = "-" if base["peak_kb"] is None else f"{base['peak_kb']:,.1f}"
+        now_kb = "-" if r["peak_kb"] is None else f"{r['peak_kb']:,.1f}"
+        print(f"  {r['size']:>10,} {r['function']:<28} {base['wall_s']:>10.4f} "
+              f"{r['wall_s']:>10.4f} {cells[0]} {base_kb:>12} {now_kb:>12} {cells[1]}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CIS 276DA analytics functions")
+    parser.add_argument("--min-size", type=int, default=1000)
+    parser.add_argument("--max-size", type=int, default=100000,
+                        help="largest order count (up to 10000000)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store this run as the new baseline")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip tracemalloc (faster, timings only)")
+    parser.add_argument("--data-dir", default=None,
+                        help="where to write the generated CSV files (default: system temp)")
+    args = parser.parse_args(argv)
+
+    print("=" * 70)
+    print("  ANALYTICS BENCHMARKS -- CIS 276DA | Preston Furulie")
+    print("=" * 70)
+
+    sizes = []
+    size = args.min_size
+    while size <= args.max_size:
+        sizes.append(size)
+        size *= 10
+
+    profiler = da.StageProfiler(trace_memory=not args.no_memory)
+    results = []
+    for size in sizes:
+        print(f"\n  Benchmark: {size:,} orders")
+        print(f"  {'Function':<28} {'Wall (s)':>10} {'CPU (s)':>10} {'Peak KB':>12}")
+        print(f"  {'-' * 28} {'-' * 10} {'-' * 10} {'-' * 12}")
+        for r in benchmark_size(size, profiler, args.seed, args.data_dir):
+            peak = "-" if r["peak_kb"] is None else f"{r['peak_kb']:,.1f}"
+            print(f"  {r['function']:<28} {r['wall_s']:>10.4f} {r['cpu_s']:>10.4f} {peak:>12}")
+            results.append(r)
+
+    report = {
+        "meta": {"python": sys.version.split()[0], "platform": platform.platform(),
+                 "seed": args.seed, "memory_traced": not args.no_memory},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n  Wrote {len(results)} results to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"  Stored baseline at {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"  No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    try:
+        regressions = compare_to_baseline(results, baseline,
+                                          memory_traced=not args.no_memory)
+    except ValueError as e:
+        print(f"  {e}")
+        return 2
+    print(f"\n  {len(regressions)} regression(s) above {REGRESSION_THRESHOLD:.2f}x")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,13 +8,31 @@
 # middleware pattern, and logging.
 # ============================================================
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 import json
 import time
 import hashlib
 import secrets
-from datetime import datetime
+import threading
+import random
+import argparse
+import itertools
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime, date, timedelta
+
+
+# Lower edges of the price facet buckets; the last bucket is open-ended.
+PRICE_BUCKET_EDGES = [0, 100, 500, 1000, 2500]
+
+
+def price_bucket(price):
+    """Return the facet label for a price, e.g. '500-1000' or '2500+'."""
+    i = max(bisect_right(PRICE_BUCKET_EDGES, price) - 1, 0)
+    if i == len(PRICE_BUCKET_EDGES) - 1:
+        return f"{PRICE_BUCKET_EDGES[i]}+"
+    return f"{PRICE_BUCKET_EDGES[i]}-{PRICE_BUCKET_EDGES[i + 1]}"
 
 
 # ── Data Store (In-Memory Database) ─────────────────────────
@@ -49,6 +67,22 @@ class DataStore:
             }
         }
         self.tokens = {}  # token → username mapping
+        self.version = 0  # bumped on every write; keys coalesced reads
+        self._write_lock = threading.Lock()  # serializes writes across handler threads
+
+        # Facet counts, kept in step with every write
+        self.category_counts = Counter()
+        self.price_counts = Counter()
+        for p in self.products:
+            self._count_facets(p, 1)
+
+    def _count_facets(self, product, delta):
+        """Add (delta=1) or remove (delta=-1) a product from the facet counts."""
+        for counts, value in ((self.category_counts, product["category"]),
+                              (self.price_counts, price_bucket(product["price"]))):
+            counts[value] += delta
+            if counts[value] <= 0:
+                del counts[value]
 
     def get_products(self, category=None, search=None, sort_by="id",
                      order="asc", page=1, limit=10):
@@ -84,6 +118,42 @@ class DataStore:
             }
         }
 
+    def get_stats(self):
+        """Compute inventory statistics across all products."""
+        total_products = len(self.products)
+        total_value = sum(p["price"] * p["stock"] for p in self.products)
+        avg_price = sum(p["price"] for p in self.products) / total_products if total_products else 0
+        low_stock = [p for p in self.products if p["stock"] < 5]
+        return {
+            "total_products": total_products,
+            "total_inventory_value": round(total_value, 2),
+            "average_price": round(avg_price, 2),
+            "low_stock_count": len(low_stock),
+            "low_stock_items": [p["name"] for p in low_stock]
+        }
+
+    def get_facets(self, search=None):
+        """Return product counts per category and per price bucket.
+
+        Without a search term the incrementally maintained counters are
+        returned directly (O(categories)); with one, matching products are
+        counted in a single pass."""
+        if search:
+            term = search.lower()
+            categories, prices = Counter(), Counter()
+            for p in self.products:
+                if term in p["name"].lower():
+                    categories[p["category"]] += 1
+                    prices[price_bucket(p["price"])] += 1
+        else:
+            categories, prices = self.category_counts, self.price_counts
+        buckets = [price_bucket(edge) for edge in PRICE_BUCKET_EDGES]
+        return {
+            "categories": dict(sorted(categories.items())),
+            "price_buckets": {b: prices.get(b, 0) for b in buckets},
+            "total": sum(categories.values()),
+        }
+
     def get_product(self, product_id):
         """Get a single product by ID."""
         for p in self.products:
@@ -99,38 +169,72 @@ class DataStore:
                 return None, f"Missing required field: {field}"
 
         product = {
-            "id": self._next_id,
             "name": data["name"],
             "price": float(data["price"]),
             "category": data["category"],
             "stock": int(data.get("stock", 0)),
             "created": datetime.now().strftime("%Y-%m-%d")
         }
-        self._next_id += 1
-        self.products.append(product)
+        with self._write_lock:
+            product = {"id": self._next_id, **product}
+            self._next_id += 1
+            self.products.append(product)
+            self._count_facets(product, 1)
+            self.version += 1
         return product, None
 
     def update_product(self, product_id, data):
         """Update an existing product."""
-        product = self.get_product(product_id)
-        if not product:
-            return None, "Product not found"
-
+        # Convert first, so a bad value fails before the product or its
+        # facet counts are touched
+        changes = {}
         for key in ("name", "price", "category", "stock"):
             if key in data:
                 if key == "price":
-                    product[key] = float(data[key])
+                    changes[key] = float(data[key])
                 elif key == "stock":
-                    product[key] = int(data[key])
+                    changes[key] = int(data[key])
                 else:
-                    product[key] = data[key]
+                    changes[key] = data[key]
+
+        with self._write_lock:
+            product = self.get_product(product_id)
+            if not product:
+                return None, "Product not found"
+
+            self._count_facets(product, -1)
+            product.update(changes)
+            self._count_facets(product, 1)
+            self.version += 1
         return product, None
 
+    def bulk_insert(self, products):
+        """Append many products at once, assigning sequential IDs.
+
+        Skips per-row validation and bumps the store version once, so
+        loading a large synthetic catalog costs O(n) with no per-row overhead.
+        products may be a generator; rows are consumed one at a time rather
+        than copied into an intermediate list."""
+        with self._write_lock:
+            start = self._next_id
+            inserted = 0
+            for p in products:
+                p["id"] = start + inserted
+                self._count_facets(p, 1)
+                self.products.append(p)
+                inserted += 1
+            self._next_id = start + inserted
+            self.version += 1
+        return inserted
+
     def delete_product(self, product_id):
         """Delete a product by ID."""
-        for i, p in enumerate(self.products):
-            if p["id"] == product_id:
-                return self.products.pop(i)
+        with self._write_lock:
+            for i, p in enumerate(self.products):
+                if p["id"] == product_id:
+                    self._count_facets(p, -1)
+                    self.version += 1
+                    return self.products.pop(i)
         return None
 
     def authenticate(self, username, password):
@@ -150,9 +254,108 @@ class DataStore:
         return self.tokens.get(token)
 
 
+# ── Synthetic Catalog Generator ─────────────────────────────
+
+# category → (relative weight, median price, brands, models)
+CATALOG_VOCABULARY = {
+    "Guitars":     (40, 899.0,  ["Fender", "Gibson", "Ibanez", "PRS", "Epiphone", "Taylor", "Martin"],
+                    ["Stratocaster", "Telecaster", "Les Paul", "SG", "RG550", "Custom 24", "214ce", "D-28"]),
+    "Basses":      (12, 799.0,  ["Fender", "Music Man", "Ibanez", "Squier", "Warwick"],
+                    ["Jazz Bass", "Precision Bass", "StingRay", "SR500", "Corvette"]),
+    "Amplifiers":  (14, 449.0,  ["Boss", "Marshall", "Fender", "Orange", "Vox"],
+                    ["Katana 100", "DSL40", "Blues Junior", "Rockerverb", "AC30"]),
+    "Keyboards":   (10, 699.0,  ["Yamaha", "Roland", "Korg", "Nord", "Casio"],
+                    ["DGX-670", "FP-30X", "Kronos", "Stage 4", "PX-S3100"]),
+    "Drums":       (8,  1199.0, ["Roland", "Pearl", "DW", "Tama", "Ludwig"],
+                    ["TD-17KVX", "Export Kit", "Collector Series", "Imperialstar", "Breakbeats"]),
+    "Accessories": (16, 39.0,   ["Shure", "Ernie Ball", "D'Addario", "Dunlop", "Planet Waves"],
+                    ["SM58", "Slinky Strings", "EXL110", "Tortex Picks", "Cable 10ft"]),
+}
+
+CATALOG_EDITIONS = ["", " Standard", " Deluxe", " Pro", " Player", " Limited", " Vintage", " MKII"]
+
+
+def generate_products(count, seed=42):
+    """Yield count synthetic products from a seeded RNG (IDs assigned on insert).
+
+    Categories follow a skewed weight table, prices are log-normal around a
+    per-category median, and stock is exponential with a long tail. The same
+    seed always yields the same catalog. O(n) time; each product is drawn
+    as it is yielded, so memory beyond the caller's use is O(1)."""
+    rng = random.Random(seed)
+    names = list(CATALOG_VOCABULARY)
+    cum_weights = list(itertools.accumulate(CATALOG_VOCABULARY[c][0] for c in names))
+    epoch = date(2024, 1, 1)
+    for _ in range(count):
+        category = rng.choices(names, cum_weights=cum_weights)[0]
+        _, median_price, brands, models = CATALOG_VOCABULARY[category]
+        name = f"{rng.choice(brands)} {rng.choice(models)}{rng.choice(CATALOG_EDITIONS)}"
+        price = round(median_price * rng.lognormvariate(0, 0.5), 2)
+        created = epoch + timedelta(days=rng.randrange(800))
+        yield {
+            "id": None,
+            "name": name,
+            "price": max(price, 0.99),
+            "category": category,
+            "stock": int(rng.expovariate(1 / 12)),
+            "created": created.isoformat(),
+        }
+
+
+def populate_store(store, count, seed=42):
+    """Bulk-load count synthetic products into store; returns rows inserted."""
+    return store.bulk_insert(generate_products(count, seed))
+
+
+# ── Request Coalescing (Single-Flight) ──────────────────────
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one computation.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait and receive the same result. Keys should
+    include the store version so a write never shares a stale result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key → in-flight call record
+
+    def do(self, key, fn):
+        """Run fn() once per key among concurrent callers and share the result."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+        return call["result"]
+
+
 # ── Global Store ────────────────────────────────────────────
 
 db = DataStore()
+reads = SingleFlight()
+
+
+def encode_json(data):
+    """Serialize a response payload to the bytes written on the wire."""
+    return json.dumps(data, indent=2).encode()
 
 
 # ── API Request Handler ─────────────────────────────────────
@@ -162,13 +365,24 @@ class APIHandler(BaseHTTPRequestHandler):
 
     def _send_json(self, data, status=200):
         """Send a JSON response with CORS headers."""
+        self._send_body(encode_json(data), status)
+
+    def _send_body(self, body, status=200):
+        """Send an already-encoded JSON body with CORS headers."""
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
         self.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization")
         self.end_headers()
-        self.wfile.write(json.dumps(data, indent=2).encode())
+        self.wfile.write(body)
+
+    def _send_coalesced(self, key, compute):
+        """Send a read result shared with identical in-flight requests."""
+        key = (key, db.version)
+        body = reads.do(key, lambda: encode_json(compute()))
+        self._send_body(body)
 
     def _read_body(self):
         """Read and parse JSON request body."""
@@ -230,8 +444,9 @@ class APIHandler(BaseHTTPRequestHandler):
             limit = int(params.get("limit", [10])[0])
             limit = min(limit, 100)  # cap at 100
 
-            result = db.get_products(category, search, sort_by, order, page, limit)
-            self._send_json(result)
+            key = ("products", category, search, sort_by, order, page, limit)
+            self._send_coalesced(key, lambda: db.get_products(
+                category, search, sort_by, order, page, limit))
 
         # Get single product
         elif path.startswith("/api/products/"):
@@ -247,22 +462,16 @@ class APIHandler(BaseHTTPRequestHandler):
 
         # List categories
         elif path == "/api/categories":
-            categories = list(set(p["category"] for p in db.products))
-            self._send_json({"categories": sorted(categories)})
+            self._send_json({"categories": sorted(db.category_counts)})
+
+        # Facet counts (optionally for a search term)
+        elif path == "/api/facets":
+            search = params.get("search", [None])[0]
+            self._send_coalesced(("facets", search), lambda: db.get_facets(search))
 
         # Stats
         elif path == "/api/stats":
-            total_products = len(db.products)
-            total_value = sum(p["price"] * p["stock"] for p in db.products)
-            avg_price = sum(p["price"] for p in db.products) / total_products if total_products else 0
-            low_stock = [p for p in db.products if p["stock"] < 5]
-            self._send_json({
-                "total_products": total_products,
-                "total_inventory_value": round(total_value, 2),
-                "average_price": round(avg_price, 2),
-                "low_stock_count": len(low_stock),
-                "low_stock_items": [p["name"] for p in low_stock]
-            })
+            self._send_coalesced(("stats",), db.get_stats)
 
         else:
             self._send_json({"error": "Not found", "path": path}, 404)
@@ -367,8 +576,22 @@ class APIHandler(BaseHTTPRequestHandler):
 # ── Server Entry Point ──────────────────────────────────────
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Guitar Shop REST API")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--synthetic", type=int, default=0, metavar="N",
+                        help="load N generated products for scale testing")
+    parser.add_argument("--seed", type=int, default=42,
+                        help="RNG seed for --synthetic")
+    args = parser.parse_args()
+
     HOST = "localhost"
-    PORT = 8080
+    PORT = args.port
+
+    if args.synthetic:
+        started = time.perf_counter()
+        loaded = populate_store(db, args.synthetic, args.seed)
+        print(f"  Loaded {loaded:,} synthetic products "
+              f"in {time.perf_counter() - started:.2f}s (seed={args.seed})")
 
     print("=" * 60)
     print("  GUITAR SHOP REST API — CIS 425 | Preston Furulie")
@@ -379,16 +602,18 @@ if __name__ == "__main__":
     print(f"    GET    /api/products               List (filter, sort, paginate)")
     print(f"    GET    /api/products/:id            Get one")
     print(f"    GET    /api/categories              List categories")
+    print(f"    GET    /api/facets                  Category/price counts")
     print(f"    GET    /api/stats                   Inventory stats")
     print(f"    POST   /api/auth/login              Login (get token)")
     print(f"    POST   /api/products               Create (auth required)")
     print(f"    PUT    /api/products/:id            Update (auth required)")
     print(f"    DELETE /api/products/:id            Delete (auth required)")
     print(f"\n  Query params: ?category=Guitars&search=fender&sort=price&order=desc&page=1&limit=5")
+    print(f"\n  Scale testing: python api_server.py --synthetic 1000000 --seed 42")
     print(f"\n  Test credentials: admin/admin123 or staff/staff123")
     print(f"\n  Press Ctrl+C to stop.\n")
 
-    server = HTTPServer((HOST, PORT), APIHandler)
+    server = ThreadingHTTPServer((HOST, PORT), APIHandler)
     try:
         server.serve_forever()
     except KeyboardInterrupt: